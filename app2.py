@@ -1,24 +1,41 @@
 import asyncio
+import contextlib
+import hashlib
+import logging
 import os
+import re
 import sys
-import json
-from datetime import datetime
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Optional, Dict, Any, AsyncIterator
 
 # Add the parent directory to the path so we can import browser_use
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
+import cmarkgfm
+import msgspec
+import orjson
 from dotenv import load_dotenv
 load_dotenv()
 
+# LOG_LEVEL applies to this module's logger only; the root logger stays at
+# WARNING so httpx doesn't log a line per Groq request
+logging.basicConfig()
+log = logging.getLogger(__name__)
+log.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
 from pydantic import BaseModel
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from groq import Groq
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
 
-# Browser Use imports
-from browser_use import Agent, ChatGroq, BrowserProfile
+# groq and browser_use (which pulls in Playwright) are imported at their call
+# sites so workers that only serve / and /reports don't pay for them
+if TYPE_CHECKING:
+    from groq import AsyncGroq
+    from browser_use import BrowserSession
 
 # Speed optimization instructions for the model (used by Browser Use Agent)
 SPEED_OPTIMIZATION_PROMPT = """
@@ -29,21 +46,59 @@ Speed optimization instructions:
 """
 
 
-def _append_jsonl(path: str, data: Dict[str, Any]) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'a', encoding='utf-8') as f:
-        f.write(json.dumps(data, ensure_ascii=False) + "\n")
+REPORTS_PATH = './data/reports.jsonl'
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Unbuffered append handle for REPORTS_PATH, opened once and kept open
+_reports_fh = None
+_reports_lock = asyncio.Lock()
+
+
+def _open_reports() -> None:
+    global _reports_fh
+    if _reports_fh is None:
+        os.makedirs(os.path.dirname(REPORTS_PATH), exist_ok=True)
+        _reports_fh = open(REPORTS_PATH, 'ab', buffering=0)
+
+
+def _close_reports() -> None:
+    global _reports_fh
+    if _reports_fh is not None:
+        _reports_fh.close()
+        _reports_fh = None
+
+
+async def _append(data: Dict[str, Any]) -> None:
+    async with _reports_lock:
+        # Normally opened by the lifespan; opened here too if the app runs without it
+        _open_reports()
+        _reports_fh.write(orjson.dumps(data) + b"\n")
 
 
 # Browser Use removed in this flow
 
 
-def _groq() -> Optional[Groq]:
+# Single shared client so the HTTP connection pool is reused across calls;
+# only cached once built, so a key set later is still picked up
+_groq_client: Optional['AsyncGroq'] = None
+
+
+def _groq() -> Optional['AsyncGroq']:
+    global _groq_client
+    if _groq_client is not None:
+        return _groq_client
     key = os.getenv('GROQ_API_KEY')
     if not key:
         return None
+    from groq import AsyncGroq
     # Use latest versions
-    return Groq(default_headers={"Groq-Model-Version": "latest"}, api_key=key)
+    # The SDK retries 429s (honouring retry-after) with exponential backoff
+    _groq_client = AsyncGroq(
+        default_headers={"Groq-Model-Version": "latest"},
+        api_key=key,
+        max_retries=int(os.getenv('GROQ_MAX_RETRIES', '4')),
+    )
+    return _groq_client
 
 
 # 1) Extract post content with Compound Mini (supports LinkedIn and X)
@@ -57,21 +112,22 @@ Rules:
 """
 
 
-def _extract_post_with_kimi(post_url: str) -> Optional[str]:
+async def _extract_post_with_kimi(post_url: str) -> Optional[str]:
     client = _groq()
     if not client:
         return None
     try:
-        resp = client.chat.completions.create(
+        resp = await client.chat.completions.create(
             model='groq/compound-mini',  # use Compound Mini for URL extraction
             messages=[
                 {"role": "system", "content": EXTRACTOR_SYSTEM},
                 {"role": "user", "content": post_url},  # Pass URL directly for compound-mini to visit
             ],
             temperature=0.0,
+            response_format={"type": "json_object"},
         )
-        content = (resp.choices[0].message.content or '').strip()
-        data = json.loads(content)
+        content = resp.choices[0].message.content or ''
+        data = orjson.loads(content)
         if isinstance(data, dict) and isinstance(data.get('post_text'), str):
             return data['post_text']
     except Exception:
@@ -80,27 +136,72 @@ def _extract_post_with_kimi(post_url: str) -> Optional[str]:
 
 
 # 1b) Extract X post content with Browser Use
+# One warm browser is shared by all X extractions; it is launched on first use
+# and kept alive so later requests skip the Chromium cold start.
+_browser_session: Optional['BrowserSession'] = None
+_browser_lock = asyncio.Lock()
+# Agents driving the shared browser at once
+_agent_sem = asyncio.Semaphore(int(os.getenv('BROWSER_CONCURRENCY', '1')))
+
+
+async def _browser() -> 'BrowserSession':
+    global _browser_session
+    async with _browser_lock:
+        if _browser_session is None:
+            from browser_use import BrowserProfile, BrowserSession
+            profile = BrowserProfile(
+                minimum_wait_page_load_time=0.5,
+                wait_between_actions=0.5,
+                headless=True,
+                keep_alive=True,
+            )
+            session = BrowserSession(browser_profile=profile)
+            await session.start()
+            _browser_session = session
+    return _browser_session
+
+
+async def _reset_browser_if_dead() -> None:
+    # Called after a failed extraction: if the shared Chromium crashed or was
+    # killed, drop it so the next X request launches a fresh one
+    global _browser_session
+    async with _browser_lock:
+        session = _browser_session
+        if session is None:
+            return
+        try:
+            alive = await session.is_connected(restart=False)
+        except Exception:
+            alive = False
+        if alive:
+            return
+        log.warning("Shared browser is no longer connected; relaunching on next X request")
+        _browser_session = None
+        with contextlib.suppress(Exception):
+            await session.kill()
+
+
+class XPost(BaseModel):
+    author: str
+    tweet: str
+
+
 async def _extract_x_post_with_browser_use(post_url: str) -> Optional[str]:
     """Extract X post content using Browser Use Agent with Groq"""
     try:
         # Ensure GROQ_API_KEY is available in env (ChatGroq reads from env)
         if not os.getenv('GROQ_API_KEY'):
-            print("No GROQ_API_KEY found for Browser Use")
+            log.warning("No GROQ_API_KEY found for Browser Use")
             return None
 
+        from browser_use import Agent, ChatGroq
+
         # Initialize Groq LLM for Browser Use (no explicit api_key; uses env)
         llm = ChatGroq(
             model='meta-llama/llama-4-maverick-17b-128e-instruct',
             temperature=0.0,
         )
 
-        # Create a speed-optimized browser profile
-        browser_profile = BrowserProfile(
-            minimum_wait_page_load_time=0.5,
-            wait_between_actions=0.5,
-            headless=False,
-        )
-        
         # Define extraction task - include author name and tweet text
         task = f"""
         Navigate to this X/Twitter post: {post_url}
@@ -109,143 +210,34 @@ async def _extract_x_post_with_browser_use(post_url: str) -> Optional[str]:
         1. The author's name (display name, not @username)
         2. The main tweet text (the actual post content)
         
-        Format the output as:
-        Author: [Author Name]
-        Tweet: [Tweet Text]
-        
         Do not include timestamps, likes, retweets, or any other metadata.
         If the tweet has images or videos, briefly describe what they show.
-        
-        Return the extracted information in the format specified above.
         """
         
-        print(f"Creating Browser Use Agent for: {post_url}")
-        
-        # Create Browser Use agent without structured output for now
-        agent = Agent(
-            task=task,
-            llm=llm,
-            browser_profile=browser_profile,
-        )
-        
-        # Run the agent and get result
-        result = await agent.run()
-        print(f"Browser Use result type: {type(result)}")
-        print(f"Browser Use result: {result}")
-
-        # Debug: print all attributes of result
-        if hasattr(result, '__dict__'):
-            print(f"Result attributes: {list(result.__dict__.keys())}")
-
-        # Try multiple ways to extract the content
-        
-        # Method 1: Check if result has final_result method or attribute
-        if hasattr(result, 'final_result'):
-            final = getattr(result, 'final_result')
-            # Check if it's a method
-            if callable(final):
-                try:
-                    final_value = final()
-                    print(f"Called final_result method, got: {final_value}")
-                    if isinstance(final_value, str) and final_value.strip():
-                        return final_value.strip()
-                except Exception as e:
-                    print(f"Error calling final_result: {e}")
-            else:
-                print(f"Found final_result attribute: {final}")
-                if isinstance(final, str) and final.strip():
-                    return final.strip()
-
-        # Method 2: Check for results in various ways
-        all_results = []
-        
-        # Try direct iteration if result is iterable
-        try:
-            all_results = list(result)
-            print(f"Got results by iterating: {len(all_results)}")
-        except:
-            pass
-        
-        # If that didn't work, try accessing as attribute
-        if not all_results:
-            all_results = getattr(result, 'all_results', []) or []
-            print(f"Got results from all_results attribute: {len(all_results)}")
-        
-        # Also try history attribute
-        if not all_results:
-            history = getattr(result, 'history', None)
-            if history:
-                all_results = getattr(history, 'all_results', []) or []
-                print(f"Got results from history.all_results: {len(all_results)}")
-        
-        print(f"Total results found: {len(all_results)}")
-        
-        for i, action_result in enumerate(all_results):
-            print(f"Result {i}: is_done={getattr(action_result, 'is_done', None)}")
-            if hasattr(action_result, '__dict__'):
-                print(f"  attributes: {list(action_result.__dict__.keys())}")
-            
-            # Check if this is the final result
-            is_done = getattr(action_result, 'is_done', False)
-            if is_done:
-                # Try multiple fields that might contain the text
-                for field in ['extracted_content', 'content', 'text', 'result', 'output']:
-                    value = getattr(action_result, field, None)
-                    if value and isinstance(value, str) and value.strip():
-                        print(f"Found text in {field}: {value}")
-                        return value.strip()
-
-        # Method 3: Check extracted_content on the main result
-        if hasattr(result, 'extracted_content'):
-            content = getattr(result, 'extracted_content')
-            if isinstance(content, str) and content.strip():
-                print(f"Found extracted_content on result: {content}")
-                return content.strip()
-
-        # Method 4: Try to get the last non-empty extracted_content
-        extracted_texts = []
-        for r in all_results:
-            extracted = getattr(r, 'extracted_content', None)
-            if isinstance(extracted, str) and extracted.strip():
-                extracted_texts.append(extracted.strip())
+        log.debug("Creating Browser Use Agent for: %s", post_url)
         
-        if extracted_texts:
-            # Return the last one (likely the final result)
-            final_text = extracted_texts[-1]
-            print(f"Using last extracted_content: {final_text}")
-            return final_text
-
-        # Method 5: Parse the string representation more robustly
-        result_str = str(result)
-        if 'extracted_content' in result_str:
-            print(f"Parsing stringified result")
-            import re
-            # Look for extracted_content in the final ActionResult (where is_done=True)
-            # Pattern to find the last extracted_content (which should be from the done action)
-            pattern = r"ActionResult\(is_done=True.*?extracted_content='([^']+)'.*?\)"
-            match = re.search(pattern, result_str, re.DOTALL)
-            if match:
-                content = match.group(1).strip()
-                print(f"Extracted from string representation: {content[:100]}...")
-                return content
-            
-            # Fallback: just find any extracted_content
-            pattern2 = r"extracted_content='([^']+)'"
-            matches = re.findall(pattern2, result_str)
-            if matches:
-                # Get the last one (likely the final result)
-                content = matches[-1].strip()
-                if content and content != 'Waited for' and not content.startswith('Waited for'):
-                    print(f"Using last extracted_content: {content[:100]}...")
-                    return content
-
-        print("ERROR: Could not extract any text from Browser Use result")
-        return None
+        async with _agent_sem:
+            # Structured output: the done action must return an XPost
+            agent = Agent(
+                task=task,
+                llm=llm,
+                browser_session=await _browser(),
+                output_model_schema=XPost,
+            )
+
+            # Run the agent and get result
+            result = await agent.run()
+
+        post = result.structured_output
+        if post is None:
+            log.warning("Browser Use returned no structured output for %s", post_url)
+            await _reset_browser_if_dead()
+            return None
+        return f"Author: {post.author}\nTweet: {post.tweet}"
             
     except Exception as e:
-        print(f"Browser Use extraction error: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Browser Use extraction error: %s", e)
+        await _reset_browser_if_dead()
         return None
 
 
@@ -263,21 +255,22 @@ No markdown or extra text.
 """
 
 
-def _shape_query_with_kimi(post_text: str, user_note: str) -> Optional[str]:
+async def _shape_query_with_kimi(post_text: str, user_note: str) -> Optional[str]:
     client = _groq()
     if not client:
         return None
     try:
-        resp = client.chat.completions.create(
+        resp = await client.chat.completions.create(
             model='moonshotai/kimi-k2-instruct',
             messages=[
                 {"role": "system", "content": QUERY_BUILDER_SYSTEM},
-                {"role": "user", "content": json.dumps({"post_text": post_text, "user_note": user_note}, ensure_ascii=False)},
+                {"role": "user", "content": orjson.dumps({"post_text": post_text, "user_note": user_note}).decode()},
             ],
             temperature=0.2,
+            response_format={"type": "json_object"},
         )
-        content = (resp.choices[0].message.content or '').strip()
-        data = json.loads(content)
+        content = resp.choices[0].message.content or ''
+        data = orjson.loads(content)
         if isinstance(data, dict) and isinstance(data.get('query'), str):
             return data['query']
     except Exception:
@@ -285,12 +278,12 @@ def _shape_query_with_kimi(post_text: str, user_note: str) -> Optional[str]:
     return None
 
 
-def _compound_search(query: str) -> str:
+async def _compound_search(query: str) -> AsyncIterator[str]:
     client = _groq()
     if not client:
-        return ""
+        return
     try:
-        chunks = client.chat.completions.create(
+        chunks = await client.chat.completions.create(
             model='groq/compound',
             messages=[{"role": "user", "content": query}],
             temperature=0.5,
@@ -298,193 +291,259 @@ def _compound_search(query: str) -> str:
             top_p=1,
             stream=True,
         )
-        buf = []
-        for chunk in chunks:
+        async for chunk in chunks:
             delta = getattr(chunk.choices[0].delta, 'content', None)
             if delta:
-                buf.append(delta)
-        return ''.join(buf)
+                yield delta
     except Exception:
-        return ""
+        return
+
+
+def _sse(data: Any, event: Optional[str] = None) -> bytes:
+    # JSON-encode each payload so newlines in deltas don't break SSE framing
+    head = f"event: {event}\n".encode() if event else b""
+    return head + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(app: FastAPI):
+    _open_reports()
+    try:
+        yield
+    finally:
+        _close_reports()
+        if _browser_session is not None:
+            await _browser_session.kill()
 
 
-api = FastAPI(title='LinkedIn Direct Analyzer')
+api = FastAPI(title='LinkedIn Direct Analyzer', default_response_class=ORJSONResponse, lifespan=_lifespan)
 api.add_middleware(
     CORSMiddleware,
     allow_origins=['*'],
     allow_methods=['*'],
     allow_headers=['*'],
 )
+api.add_middleware(GZipMiddleware, minimum_size=512)
 
 
-class Trigger(BaseModel):
+class Trigger(msgspec.Struct):
     url: str
     note: str
 
 
+# Pipelines doing Groq/browser work at once; extra triggers queue here
+_TRIGGER_SEM = asyncio.Semaphore(int(os.getenv('MAX_CONCURRENCY', '4')))
+# Strong references to in-flight answer tasks so they aren't garbage collected
+_answer_tasks: set = set()
+
+
+async def _answer_and_persist(query: str, result: Dict[str, Any], key: bytes,
+                              deltas: 'asyncio.Queue[Optional[str]]') -> None:
+    buf = []
+    try:
+        # Re-acquire a slot for the Compound call
+        async with _TRIGGER_SEM:
+            async for delta in _compound_search(query):
+                buf.append(delta)
+                deltas.put_nowait(delta)
+        result['compound_answer'] = ''.join(buf)
+        # Prerender once so the notebook UI can show it without client-side parsing
+        result['compound_answer_html'] = cmarkgfm.github_flavored_markdown_to_html(result['compound_answer'])
+        if result['compound_answer']:
+            _cache_put(_result_cache, key, result)
+        await _append(result)
+    finally:
+        # Always end the relay, even on failure
+        deltas.put_nowait(None)
+
+
+# Host must end at a port, path, query, fragment or end of input, so look-alike
+# hosts such as x.com.evil.io don't match; the scheme is optional
+_SRC_RE = re.compile(
+    r'(?:https?://)?(?:[\w-]+\.)*'
+    r'(?:(?P<linkedin>linkedin\.com)|(?P<x>x\.com|twitter\.com))'
+    r'(?=[:/?#]|$)',
+    re.I,
+)
+
+
 def _detect_source(url: str) -> str:
-    u = (url or '').lower()
-    if 'linkedin.com' in u:
-        return 'linkedin'
-    if 'x.com' in u or 'twitter.com' in u:
-        return 'x'
-    return 'unknown'
+    m = _SRC_RE.match(url or '')
+    return m.lastgroup if m else 'unknown'
+
+
+# Small LRU caches so re-triggering the same post skips the pipeline
+_CACHE_SIZE = 256
+_post_cache: 'OrderedDict[str, str]' = OrderedDict()
+_result_cache: 'OrderedDict[bytes, Dict[str, Any]]' = OrderedDict()
+
+
+def _cache_get(cache: OrderedDict, key):
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _cache_put(cache: OrderedDict, key, value) -> None:
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > _CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _trigger_key(url: str, note: str) -> bytes:
+    return hashlib.blake2b(orjson.dumps([url, note]), digest_size=16).digest()
+
+
+async def _extract_post(source: str, url: str) -> str:
+    # Extraction is note-independent, so it is cached per URL
+    cached = _cache_get(_post_cache, url)
+    if cached is not None:
+        return cached
+    if source == 'x':
+        # Use Browser Use for X posts
+        post_text = await _extract_x_post_with_browser_use(url) or ''
+    else:
+        # Use Compound Mini for LinkedIn posts
+        post_text = await _extract_post_with_kimi(url) or ''
+    if post_text:
+        _cache_put(_post_cache, url, post_text)
+    return post_text
 
 
 def _read_reports(limit: int = 100):
-    path = './data/reports.jsonl'
+    path = REPORTS_PATH
+    chunk_size = 64 * 1024
     items = []
+    carry = b''
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    items.append(json.loads(line))
-                except Exception:
-                    continue
+        with open(path, 'rb') as f:
+            # Read backwards from EOF, parsing newest lines first, until enough
+            # reports are collected or the start of the file is reached
+            pos = f.seek(0, 2)
+            while pos > 0 and len(items) < limit:
+                step = min(chunk_size, pos)
+                pos -= step
+                f.seek(pos)
+                segments = (f.read(step) + carry).split(b'\n')
+                # Before BOF the first segment may continue in the previous chunk
+                carry = segments.pop(0) if pos > 0 else b''
+                for line in reversed(segments):
+                    if len(items) >= limit:
+                        break
+                    if not line.strip():
+                        continue
+                    try:
+                        items.append(orjson.loads(line))
+                    except Exception:
+                        continue
     except FileNotFoundError:
         return []
-    items.reverse()
-    return items[:limit]
-
-
-@api.get('/', response_class=HTMLResponse)
-def home():
-    # Minimal static page that fetches /reports
-    return HTMLResponse("""
-<!doctype html>
-<html>
-<head>
-<meta charset='utf-8'>
-<meta name='viewport' content='width=device-width, initial-scale=1'>
-<title>Notebook</title>
-<style>
-body{margin:0;background:#0b0b0c;color:#f3f3f5;font:14px/1.5 system-ui,-apple-system,Segoe UI,Roboto,Helvetica,Arial}
-.wrap{display:grid;grid-template-columns:320px 1fr;min-height:100vh}
-.side{border-right:1px solid #1f1f22;padding:16px;overflow:auto}
-.main{padding:24px}
-.item{padding:8px 0;border-bottom:1px dashed #222}
-.item a{color:#f3f3f5;text-decoration:none}
-.item small{color:#9aa0a6;display:block}
-.answer{background:#111214;border:1px solid #1f1f22;border-radius:10px;padding:16px}
-.answer pre{background:#0f0f10;border:1px solid #26262a;border-radius:8px;padding:12px;overflow:auto}
-.answer code{font-family:ui-monospace,SFMono-Regular,Menlo,Monaco,Consolas,monospace}
-.answer h1,.answer h2,.answer h3{margin:14px 0 8px}
-.answer ul{margin:8px 0 8px 18px}
-.meta{color:#9aa0a6;margin:8px 0 16px}
-</style>
-</head>
-<body>
-<div class='wrap'>
-  <aside class='side'>
-    <h1>Reports</h1>
-    <div id='list'>Loading…</div>
-  </aside>
-  <main class='main'>
-    <div class='meta' id='meta'>No reports yet.</div>
-    <div class='answer' id='answer'></div>
-  </main>
-</div>
-<script>
-const API = '/reports';
-function esc(s){return (s||'').replace(/&/g,'&amp;').replace(/</g,'&lt;').replace(/>/g,'&gt;');}
-function render(md){
-  if(!md) return '';
-  const blocks=[]; md=md.replace(/```([\s\S]*?)```/g,(_,c)=>{blocks.push(c);return '@@C'+(blocks.length-1)+'@@'});
-  let h=esc(md);
-  h=h.replace(/^###\s+(.*)$/gm,'<h3>$1</h3>').replace(/^##\s+(.*)$/gm,'<h2>$1</h2>').replace(/^#\s+(.*)$/gm,'<h1>$1</h1>');
-  h=h.replace(/\[(.*?)\]\((https?:[^\s)]+)\)/g,'<a href="$2" target="_blank" rel="noopener">$1</a>');
-  h=h.replace(/\*\*(.*?)\*\*/g,'<strong>$1</strong>').replace(/\*(.*?)\*/g,'<em>$1</em>');
-  h=h.replace(/^(?:- |\* )(.*)$/gm,'<li>$1</li>').replace(/(?:<li>.*<\/li>\n?)+/g,m=>'<ul>'+m+'</ul>');
-  h=h.replace(/(^|\n)([^<\n][^\n]*)(?=\n|$)/g,(m,br,t)=>{if(/^\s*<\/?(h\d|ul|li|pre|code|blockquote)/i.test(t))return m;if(!t.trim())return m;return br+'<p>'+t+'</p>';});
-  h=h.replace(/@@C(\d+)@@/g,(_,i)=>'<pre><code>'+esc(blocks[Number(i)])+'</code></pre>');
-  return h;
-}
-function setAnswer(md){ document.getElementById('answer').innerHTML = render(md); }
-async function load(){
-  const list = document.getElementById('list');
-  list.textContent = 'Starting to load...';
-  console.log('Load function called');
-  try{
-    console.log('Fetching from:', API);
-    const res = await fetch(API, {cache:'no-store', headers: {'Cache-Control': 'no-cache'}});
-    console.log('Response status:', res.status);
-    if(!res.ok){ list.textContent='Failed to load reports ('+res.status+').'; return; }
-    const items = await res.json();
-    console.log('Received items:', items.length, 'reports');
-    if(!Array.isArray(items) || !items.length){ list.textContent='No reports yet.'; return; }
-    list.innerHTML = items.map((it,i)=>{
-      const q = it.query || ''; const preview = q.length>80? q.slice(0,80)+'…' : q; const url = it.post_url || '';
-      return `<div class='item'><a href='#' data-idx='${i}'>${preview||'(no query)'}</a><small>${url}</small></div>`;
-    }).join('');
-    const latest = items[0];
-    document.getElementById('meta').textContent = ((latest.source?('['+String(latest.source).toUpperCase()+'] '):'')) + (latest.post_url||'') + ' — ' + (latest.user_note||'');
-    setAnswer(latest.compound_answer||'');
-    list.addEventListener('click', (e)=>{
-      const a = e.target.closest('a[data-idx]'); if(!a) return; e.preventDefault();
-      const idx = parseInt(a.getAttribute('data-idx')); const it = items[idx];
-      document.getElementById('meta').textContent = ((it.source?('['+String(it.source).toUpperCase()+'] '):'')) + (it.post_url||'') + ' — ' + (it.user_note||'');
-      setAnswer(it.compound_answer||'');
-    });
-  }catch(err){ 
-    console.error('Error loading reports:', err);
-    list.textContent='Failed to load reports: ' + err.message; 
-  }
-}
-if(document.readyState==='loading') document.addEventListener('DOMContentLoaded', load); else load();
-</script>
-</body>
-</html>
-""")
-
-
-@api.get('/reports', response_class=JSONResponse)
-def api_reports():
-    return _read_reports(200)
-
-
-@api.post('/trigger')
-async def trigger(req: Trigger):
+    return items
+
+
+@api.get('/reports')
+def api_reports(request: Request):
+    # The file is append-only, so mtime + size identify its contents
+    try:
+        st = os.stat(REPORTS_PATH)
+        etag = f'W/"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    except FileNotFoundError:
+        etag = 'W/"0-0"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(_read_reports(200), headers=headers)
+
+
+# The body is decoded by hand, so document its schema for OpenAPI explicitly
+_TRIGGER_SCHEMA = msgspec.json.schema_components([Trigger])[1]['Trigger']
+
+
+@api.post(
+    '/trigger',
+    openapi_extra={
+        'requestBody': {
+            'required': True,
+            'content': {'application/json': {'schema': _TRIGGER_SCHEMA}},
+        },
+    },
+)
+async def trigger(request: Request):
+    # Decode straight from the body bytes with msgspec instead of a Pydantic model
+    try:
+        req = msgspec.json.decode(await request.body(), type=Trigger)
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     source = _detect_source(req.url)
-    
-    # Step 1: extract post content - use different methods based on source
-    if source == 'x':
-        # Use Browser Use for X posts
-        post_text = await _extract_x_post_with_browser_use(req.url) or ''
-    else:
-        # Use Compound Mini for LinkedIn posts
-        post_text = _extract_post_with_kimi(req.url) or ''
+    key = _trigger_key(req.url, req.note)
 
-    # Step 2: build query with Kimi from (post_text + user_note)
-    query = _shape_query_with_kimi(post_text, req.note) or f"{req.note} (source: {source})"
+    # Replay a recent identical trigger; it has already been persisted
+    cached = _cache_get(_result_cache, key)
+    if cached is not None:
+        async def replay():
+            yield _sse({'source': cached['source'], 'post_text': cached['post_text'], 'query': cached['query']}, event='meta')
+            yield _sse(cached['compound_answer'])
+            yield _sse(cached, event='done')
+        return StreamingResponse(replay(), media_type='text/event-stream')
 
-    # Step 3: call Compound
-    compound_answer = _compound_search(query)
+    async with _TRIGGER_SEM:
+        # Step 1: extract post content - use different methods based on source
+        post_text = await _extract_post(source, req.url)
 
-    # Persist
+        # Step 2: build query with Kimi from (post_text + user_note)
+        query = await _shape_query_with_kimi(post_text, req.note) or f"{req.note} (source: {source})"
+
+    # Step 3: call Compound, streaming deltas to the client as they arrive
     result: Dict[str, Any] = {
-        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z'),
         'post_url': req.url,
         'user_note': req.note,
         'source': source,
         'post_text': post_text,
         'query': query,
-        'compound_answer': compound_answer,
+        'compound_answer': '',
     }
-    _append_jsonl('./data/reports.jsonl', result)
-    return result
 
+    # The answer is produced by a detached task so the report is still saved
+    # if the client disconnects mid-stream; the response only relays deltas
+    deltas: 'asyncio.Queue[Optional[str]]' = asyncio.Queue()
+    task = asyncio.create_task(_answer_and_persist(query, result, key, deltas))
+    _answer_tasks.add(task)
+    task.add_done_callback(_answer_tasks.discard)
 
-if __name__ == '__main__':
-    import uvicorn
-    async def _serve_both():
-        config_x = uvicorn.Config('app2:api', host='127.0.0.1', port=8000, reload=False, log_level='info')
-        config_li = uvicorn.Config('app2:api', host='127.0.0.1', port=8001, reload=False, log_level='info')
-        server_x = uvicorn.Server(config_x)
-        server_li = uvicorn.Server(config_li)
-        await asyncio.gather(server_x.serve(), server_li.serve())
-    asyncio.run(_serve_both())
+    async def stream():
+        yield _sse({'source': source, 'post_text': post_text, 'query': query}, event='meta')
+        while (delta := await deltas.get()) is not None:
+            yield _sse(delta)
+        yield _sse(result, event='done')
 
+    return StreamingResponse(stream(), media_type='text/event-stream')
 
+
+# Notebook UI: static/index.html is served at / by StaticFiles, which sets
+# ETag/Last-Modified and answers conditional GETs with 304. Mounted last so
+# the API routes above take precedence.
+api.mount('/', StaticFiles(directory=STATIC_DIR, html=True), name='static')
+
+
+if __name__ == '__main__':
+    import socket
+    import uvicorn
+    # One server and one app instance (shared caches, browser and report
+    # handle) listening on both the X (8000) and LinkedIn (8001) ports
+    sockets = []
+    for port in (8000, 8001):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('127.0.0.1', port))
+        sockets.append(sock)
+    uvicorn.Server(uvicorn.Config(api, log_level='info')).run(sockets=sockets)
@@ -1,3 +1,26 @@
+// /trigger streams Server-Sent Events: a `meta` event, answer deltas, then a
+// `done` event carrying the persisted report. Resolve with that final report.
+async function readTriggerStream(res) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = '';
+  let done = null;
+  for (;;) {
+    const { value, done: eof } = await reader.read();
+    if (value) buf += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buf.indexOf('\n\n')) !== -1) {
+      const frame = buf.slice(0, sep);
+      buf = buf.slice(sep + 2);
+      const event = (frame.match(/^event: (.*)$/m) || [])[1];
+      const data = (frame.match(/^data: (.*)$/m) || [])[1];
+      if (event === 'done' && data) done = JSON.parse(data);
+    }
+    if (eof) break;
+  }
+  return done;
+}
+
 chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
   if (message.type === 'TRIGGER_ANALYSIS') {
     const { url, note } = message.payload || {};
@@ -6,7 +29,7 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ url, note })
     })
-      .then(async (res) => ({ ok: res.ok, body: await res.json() }))
+      .then(async (res) => ({ ok: res.ok, body: await readTriggerStream(res) }))
       .then((data) => sendResponse({ success: data.ok, data }))
       .catch((err) => sendResponse({ success: false, error: String(err) }));
     return true; // async response
@@ -18,7 +41,7 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ url, note })
     })
-      .then(async (res) => ({ ok: res.ok, body: await res.json() }))
+      .then(async (res) => ({ ok: res.ok, body: await readTriggerStream(res) }))
       .then((data) => sendResponse({ success: data.ok, data }))
       .catch((err) => sendResponse({ success: false, error: String(err) }));
     return true; // async response
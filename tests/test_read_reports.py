@@ -0,0 +1,41 @@
+import os
+import sys
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app2  # noqa: E402
+
+
+def _line(i: int, size: int) -> bytes:
+    # A JSONL record of exactly `size` bytes including the trailing newline
+    head = orjson.dumps({'i': i, 'pad': ''})
+    return head[:-2] + b'x' * (size - len(head) - 1) + b'"}\n'
+
+
+def _write(tmp_path, monkeypatch, lines):
+    path = tmp_path / 'reports.jsonl'
+    path.write_bytes(b''.join(lines))
+    monkeypatch.setattr(app2, 'REPORTS_PATH', str(path))
+
+
+def test_newline_on_chunk_boundary(tmp_path, monkeypatch):
+    # The last line is one byte short of 64KB, so the first backwards read
+    # starts exactly on the newline ending line 1
+    _write(tmp_path, monkeypatch, [_line(0, 100), _line(1, 100), _line(2, 64 * 1024 - 1)])
+    assert [r['i'] for r in app2._read_reports(1)] == [2]
+    assert [r['i'] for r in app2._read_reports(2)] == [2, 1]
+    assert [r['i'] for r in app2._read_reports(5)] == [2, 1, 0]
+
+
+def test_blank_and_invalid_lines_are_skipped(tmp_path, monkeypatch):
+    lines = [_line(0, 100), b'\n' * 5, b'{bad\n', _line(1, 70000), b'\n', _line(2, 50)]
+    _write(tmp_path, monkeypatch, lines)
+    assert [r['i'] for r in app2._read_reports(2)] == [2, 1]
+    assert [r['i'] for r in app2._read_reports(3)] == [2, 1, 0]
+
+
+def test_missing_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(app2, 'REPORTS_PATH', str(tmp_path / 'missing.jsonl'))
+    assert app2._read_reports(10) == []